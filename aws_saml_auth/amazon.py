@@ -195,10 +195,12 @@ class Amazon:
 
         return aws_id_alias
 
+    # Returns the (NotBefore, NotOnOrAfter) window of the assertion's
+    # conditions as naive UTC datetimes, or None if it can't be read.
     @staticmethod
-    def is_valid_saml_assertion(saml_xml):
+    def saml_assertion_validity(saml_xml):
         if saml_xml is None:
-            return False
+            return None
 
         try:
             doc = etree.fromstring(saml_xml)
@@ -208,15 +210,19 @@ class Amazon:
             not_before_str = conditions[0].get("NotBefore")
             not_on_or_after_str = conditions[0].get("NotOnOrAfter")
 
-            now = datetime.utcnow()
             not_before = datetime.strptime(not_before_str, "%Y-%m-%dT%H:%M:%S.%fZ")
             not_on_or_after = datetime.strptime(
                 not_on_or_after_str, "%Y-%m-%dT%H:%M:%S.%fZ"
             )
-
-            if not_before <= now < not_on_or_after:
-                return True
-            else:
-                return False
+            return not_before, not_on_or_after
         except Exception:
+            return None
+
+    @staticmethod
+    def is_valid_saml_assertion(saml_xml):
+        validity = Amazon.saml_assertion_validity(saml_xml)
+        if validity is None:
             return False
+
+        not_before, not_on_or_after = validity
+        return not_before <= datetime.utcnow() < not_on_or_after
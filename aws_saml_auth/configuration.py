@@ -2,26 +2,120 @@
 
 import os
 
-import botocore.session
-import filelock
 import logging
 from datetime import datetime
 from dateutil import tz
+from functools import cached_property
 import hashlib
 
-try:
-    from backports import configparser
-except ImportError:
-    import configparser
-
 from aws_saml_auth import util
 from aws_saml_auth import amazon
+from aws_saml_auth import fast_ini
+
+# Parsed INI files shared by every Configuration in the process, keyed by path
+# and holding (version, sections), where version is what _file_version()
+# returned when the file was parsed.
+_PARSE_CACHE = {}
+
+
+# Identifies one particular state of the file at path, or None if there is no
+# such file. Every write goes through util.Util.atomic_write(), which always
+# creates a new inode, so including st_ino (and st_ctime_ns) catches a
+# concurrent rewrite even where timestamps are too coarse for st_mtime_ns and
+# the size to change.
+def _file_version(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_ctime_ns, stat.st_mtime_ns, stat.st_size
+
+
+# Returns the parsed sections of path, only parsing the file again if it has
+# changed since it was last read or written. The result is shared, so callers
+# that mutate it must take a copy first.
+def _cached_read(path):
+    version = _file_version(path)
+    cached = _PARSE_CACHE.get(path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    sections = fast_ini.parse(path)
+    _PARSE_CACHE[path] = (version, sections)
+    return sections
+
+
+# Replace the file with the serialized sections, then remember them as the
+# current state of the file.
+def _write_sections(path, sections):
+    fast_ini.write(path, sections)
+    _PARSE_CACHE[path] = (_file_version(path), sections)
+
+
+# Merge values into one section of the INI file at path. The file is parsed
+# before the lock is taken, so concurrent writers do that work in parallel.
+# Under the lock it is read again to pick up changes made in the meantime,
+# which is only a stat when nothing changed, and then replaced.
+def _update_section(path, section, values):
+    _cached_read(path)
+
+    with util.Util.exclusive_lock(path):
+        current = _cached_read(path)
+        merged = dict(current.get(section, {}), **values)
+        # Leave the file (and anything watching it) alone if nothing changed.
+        if merged == current.get(section):
+            return
+
+        sections = dict(current)
+        sections[section] = merged
+        _write_sections(path, sections)
+
+
+# Values read() found for a profile, keyed by (config_file, profile) and
+# holding (version, values) for the config file they came from.
+_READ_CACHE = {}
+
+
+# Digests of files written as raw bytes, keyed by path and holding
+# (version, digest) for the contents last read or written.
+_FILE_DIGESTS = {}
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _remember_digest(path, version, data):
+    _FILE_DIGESTS[path] = (version, _digest(data))
+
+
+# Returns the digest of the contents of path, reading the file only when it
+# has changed since its digest was last remembered.
+def _current_digest(path):
+    version = _file_version(path)
+    cached = _FILE_DIGESTS.get(path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    if version is None:
+        return None
+
+    _remember_digest(path, version, util.Util.read_bytes(path))
+    return _FILE_DIGESTS[path][1]
+
+
+# Replace path with data, unless it already holds exactly that.
+def _write_if_changed(path, data):
+    digest = _digest(data)
+    if _current_digest(path) == digest:
+        return
+
+    util.Util.atomic_write(path, data)
+    _FILE_DIGESTS[path] = (_file_version(path), digest)
 
 
 class Configuration(object):
     def __init__(self, **kwargs):
         self.options = {}
-        self.__boto_session = botocore.session.Session()
 
         # Set up some defaults. These can be overridden as fit.
         self.ask_role = True
@@ -33,7 +127,9 @@ class Configuration(object):
         self.role_arn = None
         self.use_saml_cache = True
         self.__saml_cache = None
+        self.__saml_cache_validity = None
         self.__token_cache = None
+        self.__token_cache_valid_until = None
         self.resolve_aliases = True
         self.print_creds = False
         self.credential_process = False
@@ -52,21 +148,42 @@ class Configuration(object):
         else:
             return "profile {}".format(str(profile))
 
+    # The "~/.aws/config" section name for the profile is derived whenever the
+    # profile is set, rather than on every read() and write().
+    @property
+    def profile(self):
+        return self.__profile
+
+    @profile.setter
+    def profile(self, value):
+        self.__profile = value
+        self.__profile_section = Configuration.config_profile(value)
+
     @property
     def max_duration(self):
         return 43200
 
-    @property
+    # Resolved the same way botocore resolves its "credentials_file" and
+    # "config_file" variables, without the cost of building a botocore session.
+    # Both are looked up once per object.
+    @cached_property
     def credentials_file(self):
         return os.path.expanduser(
-            self.__boto_session.get_config_variable("credentials_file")
+            os.environ.get("AWS_SHARED_CREDENTIALS_FILE") or "~/.aws/credentials"
         )
 
-    @property
+    @cached_property
     def config_file(self):
-        return os.path.expanduser(
-            self.__boto_session.get_config_variable("config_file")
-        )
+        return os.path.expanduser(os.environ.get("AWS_CONFIG_FILE") or "~/.aws/config")
+
+    @property
+    def login_url(self):
+        return self.__login_url
+
+    @login_url.setter
+    def login_url(self, value):
+        self.__login_url = value
+        self.__saml_cache_file = None
 
     @property
     def saml_cache_file(self):
@@ -74,65 +191,97 @@ class Configuration(object):
             self.login_url is not None
         ), "Cannot look for smal cache file if no login url"
 
-        return self.credentials_file.replace(
-            "credentials",
-            "saml_cache_%s.xml"
-            % hashlib.sha1(self.login_url.encode("utf-8")).hexdigest(),
-        )
+        # The path is derived once and cleared by the login_url setter.
+        if self.__saml_cache_file is None:
+            digest = hashlib.blake2b(
+                self.login_url.encode("utf-8"), digest_size=10
+            ).hexdigest()
+            self.__saml_cache_file = self.credentials_file.replace(
+                "credentials", "saml_cache_%s.xml" % digest
+            )
+
+        return self.__saml_cache_file
+
+    # The (config_file, credentials_file) pairs that have already been created
+    # in this process, so they are only checked on disk once.
+    _ensured = set()
 
     def ensure_config_files_exist(self):
-        for file in [self.config_file, self.credentials_file]:
-            directory = os.path.dirname(file)
-            if not os.path.exists(directory):
-                os.mkdir(directory, 0o700)
+        files = (self.config_file, self.credentials_file)
+        if files in Configuration._ensured:
+            return
+
+        for file in files:
+            os.makedirs(os.path.dirname(file), mode=0o700, exist_ok=True)
             if not os.path.exists(file):
                 util.Util.touch(file)
+        Configuration._ensured.add(files)
 
     # Will return a SAML cache, ONLY if it's valid. If invalid or not set, will
-    # return None. If the SAML cache isn't valid, we'll remove it from the
-    # in-memory object. On the next write(), it will be purged from disk.
+    # return None. The assertion is parsed once by the setter, which keeps its
+    # NotBefore/NotOnOrAfter window; here it is only compared with the current
+    # time. An invalid assertion is removed from the in-memory object, so it
+    # won't be written to disk.
     @property
     def saml_cache(self):
-        if not amazon.Amazon.is_valid_saml_assertion(self.__saml_cache):
-            logging.debug("%s: Invalid saml cache", __name__)
-            self.__saml_cache = None
+        if self.__saml_cache is not None:
+            not_before, not_on_or_after = self.__saml_cache_validity
+            if not not_before <= datetime.utcnow() < not_on_or_after:
+                logging.debug("%s: Invalid saml cache", __name__)
+                self.__saml_cache = None
 
         return self.__saml_cache
 
     @saml_cache.setter
     def saml_cache(self, value):
+        validity = amazon.Amazon.saml_assertion_validity(value)
+        if value is not None and validity is None:
+            logging.debug("%s: Invalid saml cache", __name__)
+            value = None
+
         self.__saml_cache = value
+        self.__saml_cache_validity = validity
 
-    # Will return a credential cache, ONLY if it's valid.
+    # Will return a credential cache, ONLY if it's valid. The completeness of
+    # the cache is checked once when it is read, leaving only the expiration
+    # to compare here.
     @property
     def token_cache(self):
-        if self.__token_cache is not None:
-            if (
-                self.__token_cache["Expiration"] is None
-                or self.__token_cache["Expiration"] <= datetime.now(tz.UTC)
-                or self.__token_cache["AccessKeyId"] is None
-                or self.__token_cache["SecretAccessKey"] is None
-            ):
-                logging.debug("%s: Invalid token cache", __name__)
-                self.__token_cache = None
+        if self.__token_cache is not None and (
+            self.__token_cache_valid_until is None
+            or self.__token_cache_valid_until <= datetime.now(tz.UTC)
+        ):
+            logging.debug("%s: Invalid token cache", __name__)
+            self.__token_cache = None
 
         return self.__token_cache
 
+    # Attributes raise_if_invalid() requires to be of an exact type, with the
+    # description used in its error message.
+    _TYPE_CHECKS = (
+        ("ask_role", bool, "a boolean"),
+        ("duration", int, "an integer"),
+        ("auto_duration", bool, "a boolean"),
+        ("profile", str, "a string"),
+        ("region", str, "a string"),
+        ("quiet", bool, "a boolean"),
+        ("account", str, "a string"),
+        ("port", int, "an integer"),
+    )
+
     # Will raise exceptions if the configuration is invalid, otherwise returns
     # None. Use this at any point to validate the configuration is in a good
     # state. There are no checks here regarding SAML caching, as that's just a
     # user-performance improvement, and an invalid cache isn't an invalid
     # configuration.
     def raise_if_invalid(self):
-        # ask_role
-        assert (
-            self.ask_role.__class__ is bool
-        ), "Expected ask_role to be a boolean. Got {}.".format(self.ask_role.__class__)
+        for name, expected, description in Configuration._TYPE_CHECKS:
+            value_class = getattr(self, name).__class__
+            assert value_class is expected, "Expected {} to be {}. Got {}.".format(
+                name, description, value_class
+            )
 
         # duration
-        assert (
-            self.duration.__class__ is int
-        ), "Expected duration to be an integer. Got {}.".format(self.duration.__class__)
         assert (
             self.duration >= 900
         ), "Expected duration to be greater than or equal to 900. Got {}.".format(
@@ -144,23 +293,6 @@ class Configuration(object):
             self.max_duration, self.duration
         )
 
-        # auto_duration
-        assert (
-            self.auto_duration.__class__ is bool
-        ), "Expected auto_duration to be a boolean. Got {}.".format(
-            self.auto_duration.__class__
-        )
-
-        # profile
-        assert (
-            self.profile.__class__ is str
-        ), "Expected profile to be a string. Got {}.".format(self.profile.__class__)
-
-        # region
-        assert (
-            self.region.__class__ is str
-        ), "Expected region to be a string. Got {}.".format(self.region.__class__)
-
         # login_url
         assert (
             self.login_url is not None
@@ -173,28 +305,13 @@ class Configuration(object):
             ), "Expected role_arn to be None or a string. Got {}.".format(
                 self.role_arn.__class__
             )
-            assert (
-                "arn:aws:iam::" in self.role_arn
-                or "arn:aws-us-gov:iam::" in self.role_arn
-            ), "Expected role_arn to contain 'arn:aws:iam::'. Got '{}'.".format(
-                self.role_arn
+            assert self.role_arn.startswith(
+                ("arn:aws:iam::", "arn:aws-us-gov:iam::")
+            ), (
+                "Expected role_arn to start with 'arn:aws:iam::' or "
+                "'arn:aws-us-gov:iam::'. Got '{}'.".format(self.role_arn)
             )
 
-        # quiet
-        assert (
-            self.quiet.__class__ is bool
-        ), "Expected quiet to be a boolean. Got {}.".format(self.quiet.__class__)
-
-        # account
-        assert (
-            self.account.__class__ is str
-        ), "Expected account to be string. Got {}".format(self.account.__class__)
-
-        # port
-        assert (
-            self.port.__class__ is int
-        ), "Expected port to be an integer. Got {}.".format(self.port.__class__)
-
     # Write the configuration (and credentials) out to disk. This allows for
     # regular AWS tooling (aws cli and boto) to use the credentials in the
     # profile the user specified.
@@ -205,73 +322,40 @@ class Configuration(object):
             self.profile is not None
         ), "Can not store config/credentials if the AWS_PROFILE is None."
 
-        config_file_lock = filelock.FileLock(self.config_file + ".lock")
-        config_file_lock.acquire()
-        try:
-            # Write to the configuration file
-            profile = Configuration.config_profile(self.profile)
-            config_parser = configparser.RawConfigParser()
-            config_parser.read(self.config_file)
-            if not config_parser.has_section(profile):
-                config_parser.add_section(profile)
-            config_parser.set(profile, "region", self.region)
-            config_parser.set(profile, "asa.ask_role", self.ask_role)
-            config_parser.set(profile, "asa.duration", self.duration)
-            config_parser.set(profile, "asa.login_url", self.login_url)
-            config_parser.set(profile, "asa.role_arn", self.role_arn)
-
-            with open(self.config_file, "w+") as f:
-                config_parser.write(f)
-        finally:
-            config_file_lock.release()
-
-            # Write to the credentials file (only if we have credentials)
-            if amazon_object is not None:
-                credentials_file_lock = filelock.FileLock(
-                    self.credentials_file + ".lock"
-                )
-                credentials_file_lock.acquire()
-                try:
-                    credentials_parser = configparser.RawConfigParser()
-                    credentials_parser.read(self.credentials_file)
-                    if not credentials_parser.has_section(self.profile):
-                        credentials_parser.add_section(self.profile)
-                    credentials_parser.set(
-                        self.profile, "aws_access_key_id", amazon_object.access_key_id
-                    )
-                    credentials_parser.set(
-                        self.profile,
-                        "aws_secret_access_key",
-                        amazon_object.secret_access_key,
-                    )
-                    credentials_parser.set(
-                        self.profile, "aws_security_token", amazon_object.session_token
-                    )
-                    credentials_parser.set(
-                        self.profile,
-                        "aws_session_expiration",
-                        amazon_object.expiration.isoformat(),
-                    )
-                    credentials_parser.set(
-                        self.profile, "aws_session_token", amazon_object.session_token
-                    )
-
-                    with open(self.credentials_file, "w+") as f:
-                        credentials_parser.write(f)
-                finally:
-                    credentials_file_lock.release()
+        # Write to the configuration file
+        _update_section(
+            self.config_file,
+            self.__profile_section,
+            {
+                "region": str(self.region),
+                "asa.ask_role": str(self.ask_role),
+                "asa.duration": str(self.duration),
+                "asa.login_url": str(self.login_url),
+                "asa.role_arn": str(self.role_arn),
+            },
+        )
+
+        # Write to the credentials file (only if we have credentials)
+        if amazon_object is not None:
+            _update_section(
+                self.credentials_file,
+                self.profile,
+                {
+                    "aws_access_key_id": amazon_object.access_key_id,
+                    "aws_secret_access_key": amazon_object.secret_access_key,
+                    "aws_security_token": amazon_object.session_token,
+                    "aws_session_expiration": amazon_object.expiration.isoformat(),
+                    "aws_session_token": amazon_object.session_token,
+                },
+            )
 
     def write_saml_cache(self):
         self.ensure_config_files_exist()
 
-        if self.__saml_cache is not None:
-            saml_cache_file_lock = filelock.FileLock(self.saml_cache_file + ".lock")
-            saml_cache_file_lock.acquire()
-            try:
-                with open(self.saml_cache_file, "w") as f:
-                    f.write(self.__saml_cache.decode("utf-8"))
-            finally:
-                saml_cache_file_lock.release()
+        saml_cache = self.saml_cache
+        if saml_cache is not None:
+            with util.Util.exclusive_lock(self.saml_cache_file):
+                _write_if_changed(self.saml_cache_file, saml_cache)
 
     def write_token_cache(self, amazon_object):
         assert (
@@ -281,34 +365,16 @@ class Configuration(object):
             amazon_object is not None
         ), "Can not store config/credentials if the amazon_object is None."
 
-        credentials_file_lock = filelock.FileLock(self.credentials_file + ".lock")
-        credentials_file_lock.acquire()
-        try:
-            credentials_parser = configparser.RawConfigParser()
-            credentials_parser.read(self.credentials_file)
-            if not credentials_parser.has_section(self.profile):
-                credentials_parser.add_section(self.profile)
-            credentials_parser.set(
-                self.profile, "asa.aws_access_key_id", amazon_object.access_key_id
-            )
-            credentials_parser.set(
-                self.profile,
-                "asa.aws_secret_access_key",
-                amazon_object.secret_access_key,
-            )
-            credentials_parser.set(
-                self.profile,
-                "asa.aws_session_expiration",
-                amazon_object.expiration.isoformat(),
-            )
-            credentials_parser.set(
-                self.profile, "asa.aws_session_token", amazon_object.session_token
-            )
-
-            with open(self.credentials_file, "w+") as f:
-                credentials_parser.write(f)
-        finally:
-            credentials_file_lock.release()
+        _update_section(
+            self.credentials_file,
+            self.profile,
+            {
+                "asa.aws_access_key_id": amazon_object.access_key_id,
+                "asa.aws_secret_access_key": amazon_object.secret_access_key,
+                "asa.aws_session_expiration": amazon_object.expiration.isoformat(),
+                "asa.aws_session_token": amazon_object.session_token,
+            },
+        )
 
     # Read from the configuration file and override ALL values currently stored
     # in the configuration object. As this is potentially destructive, it's
@@ -320,55 +386,56 @@ class Configuration(object):
 
         # Shortening Convenience functions
         coalesce = util.Util.coalesce
-        unicode_to_string = util.Util.unicode_to_string_if_needed
 
-        profile_string = Configuration.config_profile(profile)
-        config_parser = configparser.RawConfigParser()
-        config_parser.read(self.config_file)
+        # Reuse what was read for this profile before, while the config file
+        # is unchanged.
+        key = (self.config_file, profile)
+        version = _file_version(self.config_file)
+        cached = _READ_CACHE.get(key)
+        if cached is not None and cached[0] == version:
+            read_values = cached[1]
+        else:
+            read_values = self.__read_profile(profile)
+            _READ_CACHE[key] = (version, read_values)
 
-        if config_parser.has_section(profile_string):
+        if read_values is not None:
             self.profile = profile
+            for name, value in read_values.items():
+                setattr(self, name, coalesce(value, getattr(self, name)))
 
-            # Ask Role
-            read_ask_role = config_parser[profile_string].getboolean(
-                "asa.ask_role", None
-            )
-            self.ask_role = coalesce(read_ask_role, self.ask_role)
-
-            # Duration
-            read_duration = config_parser[profile_string].getint("asa.duration", None)
-            self.duration = coalesce(read_duration, self.duration)
-
-            # Login URL
-            read_login_url = unicode_to_string(
-                config_parser[profile_string].get("asa.login_url", None)
-            )
-            self.login_url = coalesce(read_login_url, self.login_url)
+    # Returns the values stored for profile in the config file, as a dictionary
+    # of attribute names to values (None for keys that aren't set), or None if
+    # the profile has no section at all.
+    def __read_profile(self, profile):
+        # Shortening Convenience functions
+        unicode_to_string = util.Util.unicode_to_string_if_needed
 
-            # Region
-            read_region = unicode_to_string(
-                config_parser[profile_string].get("region", None)
-            )
-            self.region = coalesce(read_region, self.region)
+        if profile == self.profile:
+            profile_string = self.__profile_section
+        else:
+            profile_string = Configuration.config_profile(profile)
+        config_section = _cached_read(self.config_file).get(profile_string)
 
-            # Role ARN
-            read_role_arn = unicode_to_string(
-                config_parser[profile_string].get("asa.role_arn", None)
-            )
-            self.role_arn = coalesce(read_role_arn, self.role_arn)
+        if config_section is None:
+            return None
 
-            # Account
-            read_account = unicode_to_string(
-                config_parser[profile_string].get("account", None)
-            )
-            self.account = coalesce(read_account, self.account)
+        return {
+            "ask_role": fast_ini.getboolean(config_section, "asa.ask_role"),
+            "duration": fast_ini.getint(config_section, "asa.duration"),
+            "login_url": unicode_to_string(config_section.get("asa.login_url")),
+            "region": unicode_to_string(config_section.get("region")),
+            "role_arn": unicode_to_string(config_section.get("asa.role_arn")),
+            "account": unicode_to_string(config_section.get("account")),
+        }
 
     def read_saml_cache(self):
         if self.login_url is None:
             return
         try:
-            with open(self.saml_cache_file, "r") as f:
-                self.__saml_cache = f.read().encode("utf-8")
+            version = _file_version(self.saml_cache_file)
+            saml_cache = util.Util.read_bytes(self.saml_cache_file)
+            _remember_digest(self.saml_cache_file, version, saml_cache)
+            self.saml_cache = saml_cache
         except IOError as ex:
             logging.info("%s: SAML cache failed to read: %s", __name__, ex)
             pass
@@ -381,25 +448,29 @@ class Configuration(object):
         # Shortening Convenience functions
         unicode_to_string = util.Util.unicode_to_string_if_needed
 
-        credentials_parser = configparser.RawConfigParser()
-        credentials_parser.read(self.credentials_file)
+        credentials_section = _cached_read(self.credentials_file).get(self.profile)
 
-        if credentials_parser.has_section(self.profile):
+        if credentials_section is not None:
             token = {}
             token["AccessKeyId"] = unicode_to_string(
-                credentials_parser[self.profile].get("asa.aws_access_key_id", None)
+                credentials_section.get("asa.aws_access_key_id", None)
             )
             token["SecretAccessKey"] = unicode_to_string(
-                credentials_parser[self.profile].get("asa.aws_secret_access_key", None)
+                credentials_section.get("asa.aws_secret_access_key", None)
             )
             token["SessionToken"] = unicode_to_string(
-                credentials_parser[self.profile].get("asa.aws_session_token", None)
+                credentials_section.get("asa.aws_session_token", None)
             )
             read_expiration = unicode_to_string(
-                credentials_parser[self.profile].get("asa.aws_session_expiration", None)
+                credentials_section.get("asa.aws_session_expiration", None)
             )
             if read_expiration is not None:
-                token["Expiration"] = datetime.fromisoformat(read_expiration)
+                token["Expiration"] = util.Util.parse_aws_iso(read_expiration)
             else:
                 token["Expiration"] = None
             self.__token_cache = token
+
+            if token["AccessKeyId"] is None or token["SecretAccessKey"] is None:
+                self.__token_cache_valid_until = None
+            else:
+                self.__token_cache_valid_until = token["Expiration"]
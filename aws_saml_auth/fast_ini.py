@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+import locale
+import re
+
+from aws_saml_auth import util
+
+# The AWS config and credentials files are plain "[section]" headers followed
+# by "key = value" lines, so they are parsed with two precompiled expressions
+# instead of the generic configparser machinery. Both are matched against the
+# stripped line and are as permissive as configparser's SECTCRE and OPTCRE.
+_SECTION_RE = re.compile(r"\[(.+)\]")
+_KV_RE = re.compile(r"(.*?)\s*[=:]\s*(.*)$")
+
+_COMMENT_PREFIXES = ("#", ";")
+
+# Same truth table as configparser's getboolean().
+_BOOLEAN_STATES = {
+    "1": True,
+    "yes": True,
+    "true": True,
+    "on": True,
+    "0": False,
+    "no": False,
+    "false": False,
+    "off": False,
+}
+
+
+# Parse INI text into a {section: {key: value}} dictionary, following the
+# same rules as configparser's RawConfigParser: keys are lower cased, lines
+# indented deeper than a key continue its value (blank lines inside such a
+# value are kept) and comments only count when they fill the whole line.
+def loads(text, path="<string>"):
+    sections = {}
+    section = None
+    key = None
+    indent_level = 0
+
+    for number, line in enumerate(text.splitlines(), 1):
+        stripped = line.strip()
+        if stripped.startswith(_COMMENT_PREFIXES):
+            continue
+        if not stripped:
+            if key is not None:
+                section[key].append("")
+            continue
+
+        indent = len(line) - len(line.lstrip())
+        if key is not None and indent > indent_level:
+            section[key].append(stripped)
+            continue
+        indent_level = indent
+
+        match = _SECTION_RE.match(stripped)
+        if match:
+            section = sections.setdefault(match.group(1), {})
+            key = None
+            continue
+
+        match = _KV_RE.match(stripped)
+        if match is None or section is None or not match.group(1):
+            raise ValueError(
+                "Unable to parse {} at line {}: {!r}".format(path, number, line)
+            )
+        key = match.group(1).rstrip().lower()
+        section[key] = [match.group(2)]
+
+    # Values are collected as lists of lines while parsing.
+    for values in sections.values():
+        for name, lines in values.items():
+            values[name] = "\n".join(lines).rstrip()
+
+    return sections
+
+
+# Files are read and written in the locale's preferred encoding, which is
+# what configparser's read() and a text mode open() use.
+def _encoding():
+    return locale.getpreferredencoding(False)
+
+
+# Parse the INI file at path. A file that can't be opened or read (missing,
+# unreadable, a directory, ...) is treated as empty, like configparser's
+# read() does.
+def parse(path):
+    try:
+        data = util.Util.read_bytes(path)
+    except OSError:
+        return {}
+    return loads(data.decode(_encoding()), path)
+
+
+# Atomically replace the INI file at path with the serialized sections.
+def write(path, sections):
+    util.Util.atomic_write(path, dumps(sections).encode(_encoding()))
+
+
+# Serialize a {section: {key: value}} dictionary in the same layout that
+# configparser's write() uses, so files round-trip between the two. Values
+# must already be strings; callers stringify them once when building the
+# sections.
+def dumps(sections):
+    lines = []
+    for section, values in sections.items():
+        lines.append("[{}]\n".format(section))
+        for key, value in values.items():
+            if "\n" in value:
+                value = value.replace("\n", "\n\t")
+            lines.append("{} = {}\n".format(key, value))
+        lines.append("\n")
+    return "".join(lines)
+
+
+def getboolean(values, key):
+    value = values.get(key)
+    if value is None:
+        return None
+    if value.lower() not in _BOOLEAN_STATES:
+        raise ValueError("Not a boolean: {}".format(value))
+    return _BOOLEAN_STATES[value.lower()]
+
+
+def getint(values, key):
+    value = values.get(key)
+    if value is None:
+        return None
+    return int(value)
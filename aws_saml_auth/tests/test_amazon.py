@@ -75,6 +75,14 @@ class TestAmazon(unittest.TestCase):
         saml_xml = self.read_local_file("saml-response-no-expire.xml")
         self.assertTrue(amazon.Amazon.is_valid_saml_assertion(saml_xml))
 
+    def test_saml_assertion_validity(self):
+        saml_xml = self.read_local_file("saml-response-too-late.xml")
+        not_before, not_on_or_after = amazon.Amazon.saml_assertion_validity(saml_xml)
+        self.assertLess(not_before, not_on_or_after)
+        self.assertLess(not_on_or_after, datetime.utcnow())
+        self.assertIsNone(amazon.Amazon.saml_assertion_validity(None))
+        self.assertIsNone(amazon.Amazon.saml_assertion_validity("QmFkIFhNTA=="))
+
     @mock.patch.dict(
         os.environ, {"AWS_PROFILE": "xxx-xxxx", "DEFAULT_AWS_PROFILE": "blart"}
     )
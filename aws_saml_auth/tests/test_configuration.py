@@ -1,11 +1,32 @@
 #!/usr/bin/env python
 
+import os
+import re
+import tempfile
 import unittest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from mock import patch
 
 from aws_saml_auth import configuration
 
 
 class TestConfigurationMethods(unittest.TestCase):
+    # Point the AWS config and credentials files into a temporary directory,
+    # which doesn't exist yet, for the duration of the block.
+    @contextmanager
+    def temporary_aws_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            environ = {
+                "AWS_CONFIG_FILE": os.path.join(directory, "aws", "config"),
+                "AWS_SHARED_CREDENTIALS_FILE": os.path.join(
+                    directory, "aws", "credentials"
+                ),
+            }
+            with patch.dict(os.environ, environ):
+                yield
+
     def test_config_profile(self):
         self.assertEqual(
             configuration.Configuration.config_profile("default"), "default"
@@ -23,6 +44,132 @@ class TestConfigurationMethods(unittest.TestCase):
             configuration.Configuration.config_profile(123456), "profile 123456"
         )
 
+    def test_profile_section(self):
+        with self.temporary_aws_files():
+            c = configuration.Configuration()
+            c.profile = "testing"
+            c.login_url = "sample_login_url"
+            c.write(None)
+            c.profile = "default"
+            c.write(None)
+            with open(c.config_file) as f:
+                self.assertEqual(
+                    re.findall(r"^\[.*\]$", f.read(), re.M),
+                    ["[profile testing]", "[default]"],
+                )
+
+    def test_file_locations_default(self):
+        with patch.dict(os.environ, {}, clear=True):
+            c = configuration.Configuration()
+            self.assertEqual(c.config_file, os.path.expanduser("~/.aws/config"))
+            self.assertEqual(
+                c.credentials_file, os.path.expanduser("~/.aws/credentials")
+            )
+
+    def test_file_locations_from_environment(self):
+        environ = {
+            "AWS_CONFIG_FILE": "/tmp/asa/config",
+            "AWS_SHARED_CREDENTIALS_FILE": "/tmp/asa/credentials",
+        }
+        with patch.dict(os.environ, environ):
+            c = configuration.Configuration()
+            self.assertEqual(c.config_file, "/tmp/asa/config")
+            self.assertEqual(c.credentials_file, "/tmp/asa/credentials")
+
+    def test_ensure_config_files_exist(self):
+        with self.temporary_aws_files():
+            c = configuration.Configuration()
+            c.ensure_config_files_exist()
+            self.assertTrue(os.path.isfile(c.config_file))
+            self.assertTrue(os.path.isfile(c.credentials_file))
+
+            with patch.object(configuration.os, "makedirs") as makedirs:
+                configuration.Configuration().ensure_config_files_exist()
+            makedirs.assert_not_called()
+
+    def test_update_sees_rewrite_with_same_mtime_and_size(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "credentials")
+            configuration.util.Util.atomic_write(path, b"[a]\nk = 1\n\n[b]\nk = 1\n\n")
+            configuration._cached_read(path)
+
+            # Another writer replaces the file with one of the same size and
+            # the same mtime, as happens on filesystems with coarse timestamps.
+            before = os.stat(path)
+            configuration.util.Util.atomic_write(path, b"[a]\nk = 1\n\n[b]\nk = 2\n\n")
+            os.utime(path, ns=(before.st_atime_ns, before.st_mtime_ns))
+            self.assertEqual(os.stat(path).st_size, before.st_size)
+
+            configuration._update_section(path, "a", {"k": "3"})
+            with open(path) as f:
+                self.assertEqual(f.read(), "[a]\nk = 3\n\n[b]\nk = 2\n\n")
+
+    def test_saml_cache_file_follows_login_url(self):
+        c = configuration.Configuration()
+        c.login_url = "https://example.com/one"
+        first = c.saml_cache_file
+        self.assertEqual(c.saml_cache_file, first)
+        c.login_url = "https://example.com/two"
+        self.assertNotEqual(c.saml_cache_file, first)
+        self.assertEqual(os.path.dirname(first), os.path.dirname(c.credentials_file))
+
+    def current_saml_validity(self):
+        now = datetime.utcnow()
+        return patch.object(
+            configuration.amazon.Amazon,
+            "saml_assertion_validity",
+            return_value=(now - timedelta(minutes=5), now + timedelta(minutes=5)),
+        )
+
+    def test_saml_cache_parsed_once(self):
+        c = configuration.Configuration()
+        with self.current_saml_validity() as validity:
+            c.saml_cache = b"<saml/>"
+            self.assertEqual(c.saml_cache, b"<saml/>")
+            self.assertEqual(c.saml_cache, b"<saml/>")
+        validity.assert_called_once_with(b"<saml/>")
+
+    def test_saml_cache_expires(self):
+        c = configuration.Configuration()
+        with self.current_saml_validity():
+            c.saml_cache = b"<saml/>"
+        self.assertEqual(c.saml_cache, b"<saml/>")
+
+        later = datetime.utcnow() + timedelta(minutes=10)
+        with patch.object(configuration, "datetime") as mock_datetime:
+            mock_datetime.utcnow.return_value = later
+            self.assertIsNone(c.saml_cache)
+        self.assertIsNone(c.saml_cache)
+
+    def test_unchanged_saml_cache_is_not_rewritten(self):
+        with self.temporary_aws_files(), self.current_saml_validity():
+            c = configuration.Configuration()
+            c.login_url = "sample_login_url"
+            c.saml_cache = b"<saml/>"
+            c.write_saml_cache()
+
+            c = configuration.Configuration()
+            c.login_url = "sample_login_url"
+            c.read_saml_cache()
+            self.assertEqual(c.saml_cache, b"<saml/>")
+            with patch.object(configuration.util.Util, "atomic_write") as atomic_write:
+                c.write_saml_cache()
+                atomic_write.assert_not_called()
+
+                c.saml_cache = b"<saml>new</saml>"
+                c.write_saml_cache()
+                atomic_write.assert_called_once_with(
+                    c.saml_cache_file, b"<saml>new</saml>"
+                )
+
+    def test_saml_cache_invalid_is_dropped(self):
+        c = configuration.Configuration()
+        with patch.object(
+            configuration.amazon.Amazon, "saml_assertion_validity", return_value=None
+        ):
+            c.saml_cache = b"<saml/>"
+        self.assertIsNone(c.saml_cache)
+
     def test_duration_invalid_values(self):
         # Duration must be an integer
         c = configuration.Configuration()
@@ -201,7 +348,19 @@ class TestConfigurationMethods(unittest.TestCase):
         c.role_arn = "bad_string"
         with self.assertRaises(AssertionError) as e:
             c.raise_if_invalid()
-        self.assertIn("Expected role_arn to contain 'arn:aws:iam::'", str(e.exception))
+        self.assertIn(
+            "Expected role_arn to start with 'arn:aws:iam::' or 'arn:aws-us-gov:iam::'",
+            str(e.exception),
+        )
+
+        # role_arn must start with the partition prefix
+        c.role_arn = "bad_prefix arn:aws:iam::some_arn"
+        with self.assertRaises(AssertionError) as e:
+            c.raise_if_invalid()
+        self.assertIn(
+            "Expected role_arn to start with 'arn:aws:iam::' or 'arn:aws-us-gov:iam::'",
+            str(e.exception),
+        )
 
     def test_role_arn_is_optional(self):
         c = configuration.Configuration()
@@ -220,3 +379,20 @@ class TestConfigurationMethods(unittest.TestCase):
         c.role_arn = "arn:aws:iam::some_other_arn_2"
         self.assertEqual(c.role_arn, "arn:aws:iam::some_other_arn_2")
         c.raise_if_invalid()
+        c.role_arn = "arn:aws-us-gov:iam::some_gov_arn"
+        c.raise_if_invalid()
+
+    def test_type_invalid_values(self):
+        for name, value, message in [
+            ("auto_duration", "yes", "Expected auto_duration to be a boolean."),
+            ("quiet", 1, "Expected quiet to be a boolean."),
+            ("account", 123456789012, "Expected account to be a string."),
+            ("port", "8000", "Expected port to be an integer."),
+        ]:
+            c = configuration.Configuration()
+            c.region = "sample_region"
+            c.login_url = "sample_login_url"
+            setattr(c, name, value)
+            with self.assertRaises(AssertionError) as e:
+                c.raise_if_invalid()
+            self.assertIn(message, str(e.exception))
@@ -1,11 +1,15 @@
 #!/usr/bin/env python
 
 import unittest
+from datetime import datetime, timedelta
 from random import randint
 
 import configparser
+from dateutil import tz
+from mock import MagicMock, patch
 
 from aws_saml_auth import configuration
+from aws_saml_auth import fast_ini
 
 
 class TestConfigurationPersistence(unittest.TestCase):
@@ -67,3 +71,78 @@ class TestConfigurationPersistence(unittest.TestCase):
         self.assertEqual(test_configuration.region, self.c.region)
         self.assertEqual(test_configuration.ask_role, self.c.ask_role)
         self.assertEqual(test_configuration.duration, self.c.duration)
+
+    def test_unchanged_profile_is_not_rewritten(self):
+        with patch.object(configuration.util.Util, "atomic_write") as atomic_write:
+            self.c.write(None)
+        atomic_write.assert_not_called()
+
+        self.c.region = "us-west-2"
+        with patch.object(configuration.util.Util, "atomic_write") as atomic_write:
+            self.c.write(None)
+        atomic_write.assert_called_once()
+
+    def test_read_reuses_profile_values(self):
+        configuration.Configuration().read(self.c.profile)
+        with patch.object(configuration, "_cached_read") as cached_read:
+            test_configuration = configuration.Configuration()
+            test_configuration.read(self.c.profile)
+        cached_read.assert_not_called()
+        self.assertEqual(test_configuration.role_arn, self.c.role_arn)
+
+        self.c.role_arn = "arn:aws:iam::other_arn"
+        self.c.write(None)
+        test_configuration = configuration.Configuration()
+        test_configuration.read(self.c.profile)
+        self.assertEqual(test_configuration.role_arn, "arn:aws:iam::other_arn")
+
+    def test_read_reuses_parsed_file(self):
+        with patch.object(fast_ini, "parse", wraps=fast_ini.parse) as parse:
+            for _ in range(3):
+                configuration.Configuration().read(self.c.profile)
+        parse.assert_not_called()
+
+
+class TestTokenCachePersistence(unittest.TestCase):
+    def setUp(self):
+        self.c = configuration.Configuration()
+        self.c.profile = "aws_saml_auth_test_{}".format(randint(100, 999))
+        self.c.ensure_config_files_exist()
+
+    def tearDown(self):
+        credentials_parser = configparser.RawConfigParser()
+        credentials_parser.read(self.c.credentials_file)
+        credentials_parser.remove_section(self.c.profile)
+        with open(self.c.credentials_file, "w") as credentials_file:
+            credentials_parser.write(credentials_file)
+
+    def write_token(self, expiration):
+        amazon_object = MagicMock()
+        amazon_object.access_key_id = "access_key_id"
+        amazon_object.secret_access_key = "secret_access_key"
+        amazon_object.session_token = "session_token"
+        amazon_object.expiration = expiration
+        self.c.write_token_cache(amazon_object)
+
+        test_configuration = configuration.Configuration()
+        test_configuration.profile = self.c.profile
+        test_configuration.read_token_cache()
+        return test_configuration
+
+    def test_valid_token_cache(self):
+        expiration = datetime.now(tz.UTC).replace(microsecond=0) + timedelta(hours=1)
+        test_configuration = self.write_token(expiration)
+        self.assertEqual(
+            test_configuration.token_cache,
+            {
+                "AccessKeyId": "access_key_id",
+                "SecretAccessKey": "secret_access_key",
+                "SessionToken": "session_token",
+                "Expiration": expiration,
+            },
+        )
+
+    def test_expired_token_cache(self):
+        expiration = datetime.now(tz.UTC) - timedelta(seconds=1)
+        test_configuration = self.write_token(expiration)
+        self.assertIsNone(test_configuration.token_cache)
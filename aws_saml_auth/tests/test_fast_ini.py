@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+import unittest
+
+import configparser
+from mock import patch
+
+from aws_saml_auth import fast_ini
+
+SAMPLE = """# leading comment
+[default]
+region = us-east-1
+output=json
+
+[profile testing]
+asa.ask_role = True
+ASA.Duration = 3600
+s3 =
+    max_concurrent_requests = 20
+    max_queue_size = 10000
+; trailing comment
+"""
+
+
+class TestFastIni(unittest.TestCase):
+    def test_loads_sections_and_values(self):
+        sections = fast_ini.loads(SAMPLE)
+        self.assertEqual(list(sections), ["default", "profile testing"])
+        self.assertEqual(sections["default"], {"region": "us-east-1", "output": "json"})
+        self.assertEqual(sections["profile testing"]["asa.duration"], "3600")
+        self.assertEqual(
+            sections["profile testing"]["s3"],
+            "\nmax_concurrent_requests = 20\nmax_queue_size = 10000",
+        )
+
+    def test_loads_matches_configparser(self):
+        for text in [
+            SAMPLE,
+            "[profile x] ; note\nregion = us-east-1\n",
+            "  [default]\n  region = us-east-1\n",
+            "[default]\ns3 =\n  a = 1\n\n  b = 2\n\nregion = us-east-1\n",
+            "[default]\ns3 =\n  a = 1\n# comment\n  b = 2\n",
+            "[default]\nkey = a value ; not a comment\nother: colon\n",
+            "[default]\nkey = line one\n    line two\n\n\n[next]\nk = v\n",
+        ]:
+            parser = configparser.RawConfigParser()
+            parser.read_string(text)
+            expected = {s: dict(parser[s]) for s in parser.sections()}
+            self.assertEqual(fast_ini.loads(text), expected, text)
+
+    def test_dumps_matches_configparser(self):
+        sections = fast_ini.loads(SAMPLE)
+        parser = configparser.RawConfigParser()
+        parser.read_dict(sections)
+        with tempfile.TemporaryFile("w+") as f:
+            parser.write(f)
+            f.seek(0)
+            self.assertEqual(fast_ini.dumps(sections), f.read())
+
+    def test_round_trip(self):
+        for text in [SAMPLE, "[default]\ns3 =\n  a = 1\n\n  b = 2\n"]:
+            sections = fast_ini.loads(text)
+            self.assertEqual(fast_ini.loads(fast_ini.dumps(sections)), sections)
+
+    def test_loads_rejects_garbage(self):
+        with self.assertRaises(ValueError):
+            fast_ini.loads("key = value\n")
+        with self.assertRaises(ValueError):
+            fast_ini.loads("[default]\nnot a key value pair\n")
+
+    def test_parse_unreadable_path(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertEqual(fast_ini.parse(os.path.join(directory, "missing")), {})
+            self.assertEqual(fast_ini.parse(directory), {})
+
+    def test_parse_and_write_use_locale_encoding(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "config")
+            with open(path, "wb") as f:
+                f.write(b"# caf\xe9\n[default]\nregion = us-east-1\n")
+
+            with patch("locale.getpreferredencoding", return_value="cp1252"):
+                sections = fast_ini.parse(path)
+                sections["default"]["role"] = "caf\xe9"
+                fast_ini.write(path, sections)
+
+            with open(path, "rb") as f:
+                self.assertIn(b"role = caf\xe9\n", f.read())
+
+    def test_getboolean_and_getint(self):
+        values = {"a": "True", "b": "off", "c": "42", "d": "maybe"}
+        self.assertTrue(fast_ini.getboolean(values, "a"))
+        self.assertFalse(fast_ini.getboolean(values, "b"))
+        self.assertIsNone(fast_ini.getboolean(values, "missing"))
+        self.assertEqual(fast_ini.getint(values, "c"), 42)
+        self.assertIsNone(fast_ini.getint(values, "missing"))
+        with self.assertRaises(ValueError):
+            fast_ini.getboolean(values, "d")
@@ -1,8 +1,14 @@
 #!/usr/bin/env python
 
+import errno
+import os
 import sys
+import tempfile
+import threading
 import unittest
+from datetime import datetime, timedelta, timezone
 
+from dateutil import tz
 from mock import patch, MagicMock
 
 from aws_saml_auth import util
@@ -65,3 +71,124 @@ class TestUtilMethods(unittest.TestCase):
         self.assertEqual(util.Util.unicode_to_string_if_needed(None), None)
         self.assertEqual(util.Util.unicode_to_string_if_needed(1234), 1234)
         self.assertEqual(util.Util.unicode_to_string_if_needed("nop"), "nop")
+
+    def test_atomic_write_creates_and_replaces(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "credentials")
+            util.Util.atomic_write(file_name, b"first")
+            with open(file_name, "rb") as f:
+                self.assertEqual(f.read(), b"first")
+            util.Util.atomic_write(file_name, b"second")
+            with open(file_name, "rb") as f:
+                self.assertEqual(f.read(), b"second")
+            self.assertEqual(os.listdir(directory), ["credentials"])
+            if os.name == "posix":
+                self.assertEqual(os.stat(file_name).st_mode & 0o777, 0o600)
+
+    def test_atomic_write_follows_symlinks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            target = os.path.join(directory, "target")
+            link = os.path.join(directory, "link")
+            util.Util.atomic_write(target, b"old")
+            os.symlink(target, link)
+            util.Util.atomic_write(link, b"new")
+            self.assertTrue(os.path.islink(link))
+            with open(target, "rb") as f:
+                self.assertEqual(f.read(), b"new")
+
+    def test_atomic_write_keeps_original_on_failure(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "credentials")
+            util.Util.atomic_write(file_name, b"original")
+            with self.assertRaises(TypeError):
+                util.Util.atomic_write(file_name, "not bytes")
+            with open(file_name, "rb") as f:
+                self.assertEqual(f.read(), b"original")
+            self.assertEqual(os.listdir(directory), ["credentials"])
+
+    def test_exclusive_lock(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "credentials")
+            with util.Util.exclusive_lock(file_name):
+                self.assertTrue(os.path.exists(file_name + ".lock"))
+                if util.fcntl is not None:
+                    fd = os.open(file_name + ".lock", os.O_RDWR)
+                    try:
+                        with self.assertRaises(BlockingIOError):
+                            util.fcntl.flock(
+                                fd, util.fcntl.LOCK_EX | util.fcntl.LOCK_NB
+                            )
+                    finally:
+                        os.close(fd)
+            # The lock is released again and can be re-acquired.
+            with util.Util.exclusive_lock(file_name):
+                pass
+
+    def test_parse_aws_iso(self):
+        expected = datetime(2021, 3, 4, 5, 6, 7, tzinfo=tz.UTC)
+        parsed = util.Util.parse_aws_iso(expected.isoformat())
+        self.assertEqual(parsed, expected)
+        self.assertEqual(parsed.utcoffset(), timedelta(0))
+
+    def test_parse_aws_iso_falls_back_to_fromisoformat(self):
+        for value in [
+            "2021-03-04T05:06:07.123456+00:00",
+            "2021-03-04T07:06:07+02:00",
+            "2021-03-04 05:06:07+00:00",
+        ]:
+            self.assertEqual(
+                util.Util.parse_aws_iso(value), datetime.fromisoformat(value)
+            )
+        self.assertEqual(
+            util.Util.parse_aws_iso("2021-03-04T07:06:07+02:00"),
+            datetime(2021, 3, 4, 5, 6, 7, tzinfo=timezone.utc),
+        )
+
+    def test_read_bytes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "credentials")
+            data = b"[default]\r\nregion = us-east-1\n" * 10000
+            util.Util.atomic_write(file_name, data)
+            self.assertEqual(util.Util.read_bytes(file_name), data)
+            with self.assertRaises(FileNotFoundError):
+                util.Util.read_bytes(os.path.join(directory, "missing"))
+
+    def test_exclusive_lock_windows_retries_only_contention(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "credentials")
+            msvcrt = MagicMock()
+            with patch.object(util, "fcntl", None), patch.object(
+                util, "msvcrt", msvcrt, create=True
+            ):
+                msvcrt.locking.side_effect = [
+                    OSError(errno.EDEADLOCK, "Resource deadlock avoided"),
+                    None,
+                    None,
+                ]
+                with util.Util.exclusive_lock(file_name):
+                    pass
+                self.assertEqual(msvcrt.locking.call_count, 3)
+
+                msvcrt.locking.reset_mock()
+                msvcrt.locking.side_effect = OSError(errno.EACCES, "Permission denied")
+                with self.assertRaises(PermissionError):
+                    with util.Util.exclusive_lock(file_name):
+                        pass
+                self.assertEqual(msvcrt.locking.call_count, 1)
+
+    @unittest.skipUnless(hasattr(os, "mkfifo"), "requires FIFOs")
+    def test_read_bytes_from_fifo(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "config")
+            os.mkfifo(file_name)
+
+            def write():
+                with open(file_name, "wb") as f:
+                    f.write(b"[default]\n")
+
+            writer = threading.Thread(target=write)
+            writer.start()
+            try:
+                self.assertEqual(util.Util.read_bytes(file_name), b"[default]\n")
+            finally:
+                writer.join()
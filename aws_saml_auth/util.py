@@ -2,16 +2,26 @@
 
 from __future__ import print_function
 
+import errno
 import getpass
 import os
 import sys
 from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
 from urllib.parse import parse_qs
 from cgi import parse_header, parse_multipart
 
+from dateutil import tz
 from six.moves import input
 from tabulate import tabulate
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
 
 class Util:
     @staticmethod
@@ -89,6 +99,87 @@ class Util:
             finally:
                 f.close()
 
+    # Replace the contents of file_name with data (bytes) without ever leaving
+    # a truncated file behind: the data is written and synced to a temporary
+    # file next to the target, which is then renamed over it. Symlinks are
+    # followed so the file they point to is the one replaced.
+    @staticmethod
+    def atomic_write(file_name, data, mode=0o600):
+        file_name = os.path.realpath(file_name)
+        temp_name = "{}.tmp.{}".format(file_name, os.getpid())
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+        fd = os.open(temp_name, flags, mode)
+        try:
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view) :]
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            os.replace(temp_name, file_name)
+        except BaseException:
+            try:
+                os.unlink(temp_name)
+            except OSError:
+                pass
+            raise
+
+    # Read the whole of file_name as bytes with plain os.read() calls. The
+    # AWS files are small, so this skips setting up Python's buffered (and
+    # possibly text decoding) IO stack just to read them once.
+    @staticmethod
+    def read_bytes(file_name):
+        fd = os.open(file_name, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            # Only a hint; it fails on pipes and other unseekable files.
+            if hasattr(os, "posix_fadvise"):
+                try:
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                except OSError:
+                    pass
+            chunks = []
+            chunk = os.read(fd, 65536)
+            while chunk:
+                chunks.append(chunk)
+                chunk = os.read(fd, 65536)
+        finally:
+            os.close(fd)
+        return b"".join(chunks)
+
+    # Hold an exclusive lock on "<file_name>.lock" for the duration of the with
+    # block. The lock is taken with flock() on POSIX and msvcrt.locking() on
+    # Windows, blocking until any other holder releases it.
+    @staticmethod
+    @contextmanager
+    def exclusive_lock(file_name):
+        fd = os.open(file_name + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                # LK_LOCK gives up with EDEADLOCK after ten one second
+                # attempts while someone else holds the lock, keep trying.
+                # Any other error is permanent and raised.
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError as ex:
+                        if ex.errno != errno.EDEADLOCK:
+                            raise
+                try:
+                    yield
+                finally:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
     # This method returns the first non-None value in args. If all values are
     # None, None will be returned. If there are no arguments, None will be
     # returned.
@@ -99,6 +190,23 @@ class Util:
                 return value
         return None
 
+    # Parse the timestamps written by amazon_object.expiration.isoformat(),
+    # which always have the shape "YYYY-MM-DDTHH:MM:SS+00:00", by slicing out
+    # the fields. Anything else is handed to datetime.fromisoformat().
+    @staticmethod
+    def parse_aws_iso(value):
+        if len(value) == 25 and value[10] == "T" and value.endswith("+00:00"):
+            return datetime(
+                int(value[0:4]),
+                int(value[5:7]),
+                int(value[8:10]),
+                int(value[11:13]),
+                int(value[14:16]),
+                int(value[17:19]),
+                tzinfo=tz.UTC,
+            )
+        return datetime.fromisoformat(value)
+
     @staticmethod
     def unicode_to_string_if_needed(object):
         if "unicode" in str(object.__class__):
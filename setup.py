@@ -74,8 +74,6 @@ setup(
     # install_requires=['peppercorn'],
     install_requires=[
         "boto3",
-        "configparser",
-        "filelock",
         "lxml",
         "six",
         "tabulate",